@@ -0,0 +1,56 @@
+"""
+Wire protocol between the FastAPI workers and the inference server.
+
+Each worker owns one shared memory slab holding a single decoded frame, sized
+for the engine input, and talks to the inference server over a Unix socket
+using multiprocessing.connection messages. Every request starts with a 24-byte
+header (op, height, width, channels, source height, source width) followed by
+an optional UTF-8 payload. Every request gets exactly one reply: a 4-byte
+status followed by the reply body, or an error message when the status is
+STATUS_ERROR.
+"""
+
+import struct
+
+INFERENCE_SOCKET = "/tmp/stream2prompt-inference.sock"  # Unix socket the inference server listens on
+REPLY_TIMEOUT = 5.0  # Seconds a worker waits for a reply before giving up on the connection
+DEFAULT_CLIENT = "default"  # Client id used when the caller does not provide one
+
+# Header: op, frame height, width and channels (uint8 pixels), and the height and width of the
+# frame before the worker downscaled it, so detections can be mapped back to the uploaded image
+HEADER = struct.Struct("<6I")
+STATUS = struct.Struct("<I")
+
+OP_HELLO = 0  # payload: shared memory name of the worker's frame slab, reply: empty
+OP_PREDICT = 1  # payload: client id, frame in the slab, reply: empty once the frame was copied out
+OP_RESULT = 2  # payload: client id, reply: JSON snapshot or "null"
+OP_ROOT = 3  # no payload, reply: JSON health check payload
+OP_CONFIG = 4  # no payload, reply: JSON {"imgsz": [height, width]} of the served engine
+
+STATUS_OK = 0
+STATUS_ERROR = 1  # reply body is a UTF-8 error message
+
+
+def pack(op, payload="", shape=(0, 0, 0), source=None):
+    """Build a request from an op, an optional string payload and an optional frame and source shape"""
+    return HEADER.pack(op, *shape, *(source or shape[:2])) + payload.encode("utf-8")
+
+
+def unpack(message):
+    """Split a request into (op, (height, width, channels), (source height, source width), payload)"""
+    op, height, width, channels, source_height, source_width = HEADER.unpack_from(message)
+    payload = bytes(message[HEADER.size:]).decode("utf-8")
+    return op, (height, width, channels), (source_height, source_width), payload
+
+
+def pack_reply(status, body=b""):
+    """Build a reply from a status and a body (bytes, or str for error messages)"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return STATUS.pack(status) + body
+
+
+def unpack_reply(message):
+    """Split a reply into (status, body)"""
+    (status,) = STATUS.unpack_from(message)
+    return status, bytes(message[STATUS.size:])
@@ -0,0 +1,307 @@
+"""
+Inference server for the Model API.
+
+Owns the only TensorRT engine and CUDA context. FastAPI workers hand decoded
+frames over through shared memory and query results over a Unix socket, so
+running the API with several workers does not duplicate the engine in VRAM.
+
+Run with: uv run model-api/inference_server.py
+"""
+
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.connection import Listener
+from trt_detector import TRTDetector
+from queue import Queue, Empty, Full
+from collections import OrderedDict
+import inference_protocol as ipc
+import numpy as np
+import threading
+import traceback
+import json
+import time
+import os
+
+"""
+Configurations
+"""
+MODEL_PATHS = {
+    "fp16": "model-lab/yolo11/best.engine",  # Default, FP16 engine
+    "int8": "model-lab/yolo11/best_int8.engine",  # INT8 engine calibrated on the training dataset
+}
+MODEL_PRECISION = os.environ.get("MODEL_PRECISION", "fp16")  # Engine to serve, one of MODEL_PATHS
+if MODEL_PRECISION not in MODEL_PATHS:
+    raise RuntimeError(f"Unknown MODEL_PRECISION {MODEL_PRECISION!r}, choose one of: {', '.join(MODEL_PATHS)}")
+YOLO_MODEL_PATH = MODEL_PATHS[MODEL_PRECISION]  # Path to the YOLO model
+BATCH_SIZE = 4  # Max frames per inference call, capped at the engine's export batch
+QUEUE_SIZE = 16  # Max pending frames across all clients
+MAX_CLIENTS = 64  # Max clients with a stored result, the least recently updated one is evicted first
+CONFIDENCE_THRESHOLD = 0.25  # Detections below this confidence are not reported
+KEEP_HOT_INTERVAL = 0.05  # Idle time (seconds) after which a dummy inference keeps the GPU clocked up
+KEEP_HOT_DURATION = 5.0  # Stop keeping the GPU hot after this many seconds without real frames
+MAX_CONSECUTIVE_FAILURES = 10  # Exit after this many failed inference steps in a row, so workers answer 503
+
+"""
+Load YOLO model and warm up
+"""
+# The engine is driven directly through TensorRT, bypassing the Ultralytics predictor
+yolo_model = TRTDetector(YOLO_MODEL_PATH)
+
+# Refuse to serve an engine built at another precision, e.g. an FP32 build is slower than the FP16 one on the same GPU.
+# Rebuild with: model.export(format="engine", half=True, dynamic=True, simplify=True, workspace=8, batch=4, nms=True)
+if yolo_model.precision != MODEL_PRECISION:
+    raise RuntimeError(
+        f"{YOLO_MODEL_PATH} is not an {MODEL_PRECISION.upper()} engine (export metadata says {yolo_model.precision}), "
+        "re-export it with model-lab/model-training.py"
+    )
+
+width, height = 256, 256
+warmup_img = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+random_info = yolo_model([warmup_img], conf=CONFIDENCE_THRESHOLD)
+
+"""
+Images
+"""
+# Latest fully built /result/ payload per client id, replaced atomically under the lock and
+# ordered from least to most recently updated so abandoned client ids are evicted first
+_state_lock = threading.Lock()
+_snapshots = OrderedDict()
+
+# Pending (client, image) frames, drained in batches by the prediction loop
+img_queue = Queue(maxsize=QUEUE_SIZE)
+
+
+def extract_detections(result, scale=(1.0, 1.0)):
+    """Resolve a single image prediction into a list of detections sorted by confidence"""
+    # Bounding boxes, confidence scores and class indices, already on the CPU
+    bboxes, confidences, classes = result
+
+    # Map boxes from the frame the worker handed over back to the image that was uploaded
+    if scale != (1.0, 1.0):
+        bboxes = bboxes * np.array([*scale, *scale], dtype=bboxes.dtype)
+
+    # Filter by confidence and sort in descending order with NumPy before touching Python objects
+    keep = np.flatnonzero(confidences >= CONFIDENCE_THRESHOLD)
+    order = keep[np.argsort(-confidences[keep], kind="stable")]
+    names = [yolo_model.names[c] for c in classes[order].tolist()]
+
+    # Create list of detections with class names, confidence, and bounding boxes
+    detections = [
+        {"class_name": name, "confidence": conf, "bbox": bbox}  # bbox is [x1, y1, x2, y2]
+        for name, conf, bbox in zip(names, confidences[order].tolist(), bboxes[order].tolist())
+    ]
+
+    return detections
+
+
+def build_snapshot(result, scale, timestamp):
+    """Build the /result/ payload for a single image prediction"""
+    detections = extract_detections(result, scale)
+
+    # Check if prediction has results
+    if detections:
+        return {
+            "detections": detections,
+            "timestamp": timestamp,
+            "total_objects": len(detections)
+        }
+    else:
+        return {
+            "detections": [],
+            "timestamp": timestamp,
+            "total_objects": 0,
+            "message": "No objects detected in the image"
+        }
+
+
+def publish(clients, scales, handle):
+    """Wait for a submitted batch and publish its per-client snapshots"""
+    results = yolo_model.collect(handle)
+    timestamp = time.time()
+
+    # Resolve the payloads outside the lock, then publish them in one step
+    snapshots = {
+        client: build_snapshot(result, scale, timestamp)
+        for client, scale, result in zip(clients, scales, results)
+    }
+    with _state_lock:
+        for client, snapshot in snapshots.items():
+            _snapshots[client] = snapshot
+            _snapshots.move_to_end(client)
+        while len(_snapshots) > MAX_CLIENTS:
+            _snapshots.popitem(last=False)
+
+
+def prediction_failed(failures):
+    """Log a failed inference step, exits the process once failures keep repeating"""
+    traceback.print_exc()
+    failures += 1
+    if failures >= MAX_CONSECUTIVE_FAILURES:
+        # Stale snapshots would be served forever otherwise; with the server gone, workers answer 503
+        print(f"Inference failed {failures} times in a row, shutting down the inference server", flush=True)
+        os._exit(1)
+    return failures
+
+
+def prediction_loop():
+    last_frame_time = 0
+    batch_size = min(BATCH_SIZE, yolo_model.max_batch)
+    pending = None  # (clients, scales, handle) of the batch currently running on the GPU
+    failures = 0  # Inference steps that failed in a row
+    while True:
+        try:
+            if pending is not None:
+                # A batch is running, only take frames that are already waiting so the
+                # next batch is prepared while the GPU is busy
+                frame = img_queue.get_nowait()
+            else:
+                # Wait for a frame; while recently active, run a dummy inference on every idle gap
+                # so TensorRT does not fall back to its slow path when clocks de-boost between frames
+                keep_hot = time.time() - last_frame_time < KEEP_HOT_DURATION
+                frame = img_queue.get(timeout=KEEP_HOT_INTERVAL if keep_hot else None)
+        except Empty:
+            try:
+                if pending is not None:
+                    publish(*pending)
+                else:
+                    yolo_model([warmup_img])
+                failures = 0
+            except Exception:
+                failures = prediction_failed(failures)
+            pending = None
+            continue
+
+        # Grab whatever else is already waiting
+        batch = dict([frame])
+        while len(batch) < batch_size:
+            try:
+                client, item = img_queue.get_nowait()
+            except Empty:
+                break
+            batch[client] = item  # Newer frame from the same client replaces the older one
+        last_frame_time = time.time()
+
+        # Start the whole batch at once, then finish the previous one while it runs
+        try:
+            images, scales = zip(*batch.values())
+            handle = yolo_model.submit(list(images), conf=CONFIDENCE_THRESHOLD)
+            if pending is not None:
+                publish(*pending)
+            pending = (list(batch), scales, handle)
+            failures = 0
+        except Exception:
+            # Drop the failed batch and the one in flight, each slot is resynchronized before reuse
+            pending = None
+            failures = prediction_failed(failures)
+
+
+def submit_frame(client, img, source):
+    """Queue a frame for prediction, dropping the oldest pending frame when full"""
+    height, width = img.shape[:2]
+    frame = (client, (img, (source[1] / width, source[0] / height)))
+    while True:
+        try:
+            img_queue.put_nowait(frame)
+            return
+        except Full:
+            try:
+                img_queue.get_nowait()
+            except Empty:
+                pass
+
+
+"""
+Server
+"""
+# Health check payload, resolved once from the warmup prediction
+root_payload = json.dumps({
+    "detections": [
+        {"class_name": d["class_name"], "confidence": d["confidence"]}
+        for d in extract_detections(random_info[0])
+    ]
+}).encode("utf-8")
+
+# Engine input size, workers downscale frames to fit it before handing them over
+config_payload = json.dumps({"imgsz": list(yolo_model.imgsz)}).encode("utf-8")
+
+
+def attach_slab(name):
+    """Attach to a worker's frame slab without taking ownership of it"""
+    slab = shared_memory.SharedMemory(name=name)
+    # The worker created the slab and unlinks it; stop this process' tracker from doing so too
+    resource_tracker.unregister(slab._name, "shared_memory")
+    return slab
+
+
+def handle_message(message, slab):
+    """Answer one worker message, returns (reply body, the worker's slab after the message)"""
+    op, shape, source, payload = ipc.unpack(message)
+
+    if op == ipc.OP_HELLO:
+        new_slab = attach_slab(payload)
+        if slab is not None:
+            slab.close()
+        return b"", new_slab
+
+    elif op == ipc.OP_PREDICT:
+        if slab is None:
+            raise ValueError("No frame slab registered, send OP_HELLO first")
+        if shape[2] != 3 or not 0 < shape[0] * shape[1] * shape[2] <= slab.size or 0 in source:
+            raise ValueError(f"Frame of shape {shape} does not fit the frame slab")
+        # Copy the frame out so the worker can reuse its slab as soon as we reply
+        img = np.ndarray(shape, dtype=np.uint8, buffer=slab.buf).copy()
+        submit_frame(payload, img, source)
+        return b"", slab
+
+    elif op == ipc.OP_RESULT:
+        with _state_lock:
+            snapshot = _snapshots.get(payload)
+        return json.dumps(snapshot).encode("utf-8"), slab
+
+    elif op == ipc.OP_ROOT:
+        return root_payload, slab
+
+    elif op == ipc.OP_CONFIG:
+        return config_payload, slab
+
+    raise ValueError(f"Unknown op {op}")
+
+
+def serve_connection(conn):
+    """Answer one worker's messages until it disconnects"""
+    slab = None
+    try:
+        while True:
+            message = conn.recv_bytes()
+
+            # Every message gets a reply, otherwise the worker would wait on it forever
+            try:
+                body, slab = handle_message(message, slab)
+            except Exception as e:
+                conn.send_bytes(ipc.pack_reply(ipc.STATUS_ERROR, f"{type(e).__name__}: {e}"))
+            else:
+                conn.send_bytes(ipc.pack_reply(ipc.STATUS_OK, body))
+    except (EOFError, ConnectionResetError, BrokenPipeError):
+        pass  # Worker went away
+    finally:
+        if slab is not None:
+            slab.close()
+        conn.close()
+
+
+def serve():
+    # Start the prediction loop in a separate thread
+    threading.Thread(target=prediction_loop, daemon=True).start()
+
+    # Remove a socket left behind by a previous run
+    if os.path.exists(ipc.INFERENCE_SOCKET):
+        os.unlink(ipc.INFERENCE_SOCKET)
+
+    with Listener(ipc.INFERENCE_SOCKET, family="AF_UNIX", backlog=16) as listener:
+        print(f"Inference server listening on {ipc.INFERENCE_SOCKET}")
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=serve_connection, args=(conn,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    serve()
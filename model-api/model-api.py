@@ -1,56 +1,112 @@
-from fastapi import FastAPI, File
+from fastapi import FastAPI, File, HTTPException
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client
 from typing import Annotated
-from ultralytics import YOLO
-from PIL import Image
+import inference_protocol as ipc
 import numpy as np
 import threading
-import time
-import io
+import atexit
+import json
+import cv2
 
 """
-Configurations
+Inference server connection
 """
-YOLO_MODEL_PATH = "model-lab/yolo11/best.engine"  # Path to the YOLO model
+# Inference runs in a separate process (inference_server.py) that owns the only engine, so
+# every worker shares it. Each worker owns one shared memory slab for handing over frames.
+_slab = None
+_conn = None
+_conn_lock = threading.Lock()
+imgsz = None  # Engine input (height, width), frames are downscaled to fit before the handover
 
-"""
-Load YOLO model and warm up
-"""
-yolo_model = YOLO(YOLO_MODEL_PATH, task='detect')
-width, height = 256, 256
-random_info = yolo_model([Image.fromarray(np.random.randint(0, 256, (height, width, 3), dtype=np.uint8), 'RGB')])
 
-"""
-Images
-"""
-prediction = None
-last_prediction_time = 0
+def exchange(conn, message):
+    """Send one message and wait for its reply, returns the reply body"""
+    conn.send_bytes(message)
+    if not conn.poll(ipc.REPLY_TIMEOUT):
+        raise TimeoutError(f"Inference server did not reply within {ipc.REPLY_TIMEOUT}s")
+    status, body = ipc.unpack_reply(conn.recv_bytes())
+    if status != ipc.STATUS_OK:
+        raise RuntimeError(f"Inference server error: {body.decode('utf-8')}")
+    return body
+
+
+def release_slab():
+    if _slab is not None:
+        _slab.close()
+        _slab.unlink()
+
+
+atexit.register(release_slab)
+
+
+def connect():
+    """Connect to the inference server and register a frame slab sized for its engine input"""
+    global _conn, _slab, imgsz
+    conn = Client(ipc.INFERENCE_SOCKET, family="AF_UNIX")
+    try:
+        height, width = json.loads(exchange(conn, ipc.pack(ipc.OP_CONFIG)))["imgsz"]
 
-new_img = False
-predicting = False
+        # Only ever grow the slab, so a frame fitted to the previous engine still fits
+        if _slab is None or _slab.size < height * width * 3:
+            release_slab()
+            _slab = shared_memory.SharedMemory(create=True, size=height * width * 3)
+        exchange(conn, ipc.pack(ipc.OP_HELLO, _slab.name))
+    except BaseException:
+        conn.close()
+        raise
+    _conn, imgsz = conn, (height, width)
 
-img = None
-img_buffer = None
 
+def disconnect():
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
 
-def prediction_loop():
-    global predicting, img_buffer, img, new_img, prediction, last_prediction_time
-    while True:
-        if new_img:
-            predicting = True
-            img = img_buffer
-            img_buffer = None
-            new_img = False
 
-            # Perform prediction
-            prediction = yolo_model(img)
-            last_prediction_time = time.time()
-            
-            predicting = False
-        time.sleep(0.1)  # Sleep briefly to avoid busy-waiting
+def request(op, payload="", frame=None, source=None):
+    """Send one message to the inference server and return its reply, reconnecting once if the server restarted"""
+    # The slab is reused for every frame, so write and hand over under the connection lock
+    with _conn_lock:
+        for retry in (True, False):
+            try:
+                if _conn is None:
+                    connect()
+                shape = (0, 0, 0)
+                if frame is not None:
+                    np.ndarray(frame.shape, dtype=np.uint8, buffer=_slab.buf)[:] = frame
+                    shape = frame.shape
+                return exchange(_conn, ipc.pack(op, payload, shape, source))
+            except TimeoutError as e:
+                # A late reply would be read as the answer to the next message, so start over
+                disconnect()
+                raise HTTPException(status_code=503, detail=str(e)) from None
+            except (EOFError, OSError) as e:
+                # The inference server went away, retry once on a fresh connection
+                disconnect()
+                if not retry:
+                    raise HTTPException(status_code=503, detail=f"Inference server is not available: {e}") from None
+            except RuntimeError as e:
+                raise HTTPException(status_code=503, detail=str(e)) from None
 
 
-# Start the prediction loop in a separate thread
-threading.Thread(target=prediction_loop, daemon=True).start()
+def fit_to_input(img):
+    """Downscale a frame to fit the engine input, the inference server letterboxes the rest of the way"""
+    height, width = img.shape[:2]
+    r = min(imgsz[0] / height, imgsz[1] / width)
+    if r < 1:
+        size = (max(1, round(width * r)), max(1, round(height * r)))
+        img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    return img
+
+
+try:
+    connect()
+except (FileNotFoundError, ConnectionRefusedError):
+    raise RuntimeError(
+        f"Inference server is not running on {ipc.INFERENCE_SOCKET}, start it with: uv run model-api/inference_server.py"
+    ) from None
 
 
 """
@@ -58,74 +114,33 @@ API
 """
 app = FastAPI()
 
+# Health check payload, resolved once by the inference server from its warmup prediction
+root_payload = json.loads(request(ipc.OP_ROOT))
+
 @app.get("/")
 async def root():
-    if random_info[0].boxes is not None and len(random_info[0].boxes) > 0:
-        # Get class indices, confidence scores, and class names
-        classes = random_info[0].boxes.cls.int().cpu().numpy()
-        confidences = random_info[0].boxes.conf.cpu().numpy()
-        
-        # Create list of detections with class names and confidence
-        detections = []
-        for cls_idx, conf in zip(classes, confidences):
-            detections.append({
-                "class_name": random_info[0].names[cls_idx.item()],
-                "confidence": float(conf)
-            })
-        
-        # Sort by confidence in descending order
-        detections.sort(key=lambda x: x["confidence"], reverse=True)
-        
-        return {"detections": detections}
-    else:
-        return {"detections": []}
+    return root_payload
 
 @app.post("/predict/")
-async def predict(image: Annotated[bytes, File()]):
-    global predicting, img_buffer, new_img
-    img_buffer = Image.open(io.BytesIO(image))
-    new_img = True
+def predict(image: Annotated[bytes, File()], client: str = ipc.DEFAULT_CLIENT):
+    # Decode straight to a BGR ndarray, the layout the inference server expects
+    img = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+
+    # Hand over at most an engine input worth of pixels, detections are scaled back to the uploaded size
+    request(ipc.OP_PREDICT, client, frame=fit_to_input(img), source=img.shape[:2])
     return {"status": "Image received for prediction"}
 
 @app.get("/result/")
-async def get_result():
-    global prediction, last_prediction_time
-    
-    if prediction is None:
+def get_result(client: str = ipc.DEFAULT_CLIENT):
+    snapshot = json.loads(request(ipc.OP_RESULT, client))
+
+    if snapshot is None:
         return {
             "detections": [],
             "timestamp": None,
             "message": "No prediction available yet"
         }
-    
-    # Check if prediction has results
-    if prediction[0].boxes is not None and len(prediction[0].boxes) > 0:
-        # Get class indices, confidence scores, bounding boxes, and class names
-        classes = prediction[0].boxes.cls.int().cpu().numpy()
-        confidences = prediction[0].boxes.conf.cpu().numpy()
-        bboxes = prediction[0].boxes.xyxy.cpu().numpy()
-        
-        # Create list of detections with class names, confidence, and bounding boxes
-        detections = []
-        for cls_idx, conf, bbox in zip(classes, confidences, bboxes):
-            detections.append({
-                "class_name": prediction[0].names[cls_idx.item()],
-                "confidence": float(conf),
-                "bbox": bbox.tolist()  # [x1, y1, x2, y2]
-            })
-        
-        # Sort by confidence in descending order
-        detections.sort(key=lambda x: x["confidence"], reverse=True)
-        
-        return {
-            "detections": detections,
-            "timestamp": last_prediction_time,
-            "total_objects": len(detections)
-        }
-    else:
-        return {
-            "detections": [],
-            "timestamp": last_prediction_time,
-            "total_objects": 0,
-            "message": "No objects detected in the image"
-        }
\ No newline at end of file
+
+    return snapshot
@@ -0,0 +1,209 @@
+"""
+Direct TensorRT runner for YOLO detection engines exported by Ultralytics.
+
+Skips the Ultralytics predictor and drives the engine with execute_async_v3 on
+preallocated device buffers. Frames are uploaded as raw uint8 and letterboxed
+and normalized on the GPU; for engines exported without nms=True, NMS also
+runs on the GPU.
+"""
+
+import json
+
+import numpy as np
+import tensorrt as trt
+import torch
+import torch.nn.functional as F
+import torchvision
+
+# TensorRT tensor types used by YOLO engines, mapped to torch buffer types
+TORCH_DTYPES = {
+    trt.DataType.HALF: torch.float16,
+    trt.DataType.FLOAT: torch.float32,
+    trt.DataType.INT32: torch.int32,
+}
+
+LETTERBOX_COLOR = 114  # Padding gray level used by Ultralytics letterbox
+IOU_THRESHOLD = 0.7  # NMS IoU threshold, same as the Ultralytics default
+MAX_DETECTIONS = 300  # Max detections kept per image after NMS
+
+
+class InferenceSlot:
+    """Pinned host staging, device buffers, CUDA stream and execution context for one in-flight batch"""
+
+    def __init__(self, detector):
+        engine = detector.engine
+        self.stream = torch.cuda.Stream(detector.device)
+        self.context = engine.create_execution_context()
+
+        input_shape = (detector.max_batch, 3, *detector.imgsz)
+        input_dtype = TORCH_DTYPES[engine.get_tensor_dtype(detector.input_name)]
+        if not self.context.set_input_shape(detector.input_name, input_shape):
+            raise RuntimeError(f"Engine rejected input shape {input_shape}")
+
+        # Page-locked uint8 staging for the raw frames so the H2D copy is a real async DMA,
+        # grown on demand since frame sizes vary
+        self.staging = torch.empty(0, dtype=torch.uint8, pin_memory=True)
+        self.input = torch.empty(input_shape, dtype=input_dtype, device=detector.device)
+        self.output = torch.empty(
+            tuple(self.context.get_tensor_shape(detector.output_name)),
+            dtype=TORCH_DTYPES[engine.get_tensor_dtype(detector.output_name)],
+            device=detector.device,
+        )
+        self.context.set_tensor_address(detector.input_name, self.input.data_ptr())
+        self.context.set_tensor_address(detector.output_name, self.output.data_ptr())
+
+    def stage(self, images):
+        """Pack BGR uint8 images back to back into the pinned staging buffer, returns the used size"""
+        nbytes = sum(img.nbytes for img in images)
+        if self.staging.numel() < nbytes:
+            self.staging = torch.empty(nbytes, dtype=torch.uint8, pin_memory=True)
+
+        staging = self.staging.numpy()
+        offset = 0
+        for img in images:
+            staging[offset:offset + img.nbytes] = np.ascontiguousarray(img).reshape(-1)
+            offset += img.nbytes
+        return nbytes
+
+
+class TRTDetector:
+    SLOTS = 2  # Batches that can be in flight at once, so frame N+1 is prepared while N runs
+
+    def __init__(self, engine_path: str, device: int = 0):
+        self.device = torch.device(f"cuda:{device}")
+        torch.cuda.set_device(self.device)
+
+        # Ultralytics prepends a length-prefixed JSON metadata block to the serialized engine
+        logger = trt.Logger(trt.Logger.WARNING)
+        with open(engine_path, "rb") as f, trt.Runtime(logger) as runtime:
+            try:
+                meta_len = int.from_bytes(f.read(4), byteorder="little")
+                metadata = json.loads(f.read(meta_len).decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                f.seek(0)
+                metadata = {}
+            self.engine = runtime.deserialize_cuda_engine(f.read())
+
+        self.names = {int(k): v for k, v in metadata.get("names", {}).items()}
+        self.imgsz = tuple(metadata.get("imgsz", (640, 640)))
+
+        # Single input ("images") and single output ("output0")
+        names = [self.engine.get_tensor_name(i) for i in range(self.engine.num_io_tensors)]
+        self.input_name = next(n for n in names if self.engine.get_tensor_mode(n) == trt.TensorIOMode.INPUT)
+        self.output_name = next(n for n in names if self.engine.get_tensor_mode(n) == trt.TensorIOMode.OUTPUT)
+
+        # Build precision from the export arguments; the FP16 and INT8 builder flags do not
+        # change the I/O tensor types, so the engine itself cannot tell them apart
+        args = metadata.get("args", {})
+        self.precision = "int8" if args.get("int8") else "fp16" if args.get("half") else "fp32" if args else None
+
+        # Allocate buffers once for the largest batch the engine accepts
+        input_shape = self.engine.get_tensor_shape(self.input_name)
+        self.dynamic = input_shape[0] == -1
+        if self.dynamic:
+            self.max_batch = self.engine.get_tensor_profile_shape(self.input_name, 0)[2][0]
+        else:
+            self.max_batch = input_shape[0]
+        self.slots = [InferenceSlot(self) for _ in range(self.SLOTS)]
+        self.next_slot = 0
+
+        # Engines exported with nms=True emit (B, max_det, 6) final detections instead of
+        # raw (B, 4 + nc, anchors) predictions, so NMS is already fused into the engine
+        self.end2end = self.slots[0].output.shape[-1] == 6
+
+    def preprocess(self, frames, shapes, input):
+        """Letterbox, BGR->RGB, HWC->CHW and normalize packed uint8 frames on the GPU, straight into the engine input"""
+        new_h, new_w = self.imgsz
+        input[:len(shapes)].fill_(LETTERBOX_COLOR / 255.0)
+
+        transforms = []
+        offset = 0
+        for i, (h, w) in enumerate(shapes):
+            img = frames[offset:offset + h * w * 3].view(h, w, 3)
+            offset += h * w * 3
+
+            # Resize to fit, keeping the aspect ratio, and center on the padded canvas
+            r = min(new_h / h, new_w / w)
+            unpad_h, unpad_w = round(h * r), round(w * r)
+            top, left = (new_h - unpad_h) // 2, (new_w - unpad_w) // 2
+
+            img = img.flip(-1).permute(2, 0, 1).unsqueeze(0).float()
+            if (unpad_h, unpad_w) != (h, w):
+                img = F.interpolate(img, size=(unpad_h, unpad_w), mode="bilinear", align_corners=False, antialias=True)
+            input[i, :, top:top + unpad_h, left:left + unpad_w] = img[0] / 255.0
+            transforms.append((r, left, top))
+        return transforms
+
+    def postprocess(self, output, transforms, shapes, conf):
+        """Turn engine output into per-image detections mapped back to the original images"""
+        detections = []
+        for pred, (r, dx, dy), (h, w) in zip(output.float(), transforms, shapes):
+            if self.end2end:
+                # (max_det, 6) rows of (x1, y1, x2, y2, score, class), NMS done in the engine
+                pred = pred[pred[:, 4] >= conf]
+                boxes, scores, classes = pred[:, :4], pred[:, 4], pred[:, 5]
+            else:
+                boxes, scores, classes = self.nms(pred.T, conf)
+
+            # Undo the letterbox transform
+            boxes -= boxes.new_tensor([dx, dy, dx, dy])
+            boxes /= r
+            boxes[:, 0::2] = boxes[:, 0::2].clamp(0, w)
+            boxes[:, 1::2] = boxes[:, 1::2].clamp(0, h)
+
+            detections.append((boxes.cpu().numpy(), scores.cpu().numpy(), classes.int().cpu().numpy()))
+        return detections
+
+    def nms(self, pred, conf):
+        """Run NMS on raw (anchors, 4 + nc) predictions, returns xyxy boxes, scores and classes"""
+        scores, classes = pred[:, 4:].max(1)
+        keep = scores >= conf
+        pred, scores, classes = pred[keep], scores[keep], classes[keep]
+
+        # (cx, cy, w, h) -> (x1, y1, x2, y2)
+        boxes = torch.cat((pred[:, :2] - pred[:, 2:4] / 2, pred[:, :2] + pred[:, 2:4] / 2), 1)
+        keep = torchvision.ops.batched_nms(boxes, scores, classes, IOU_THRESHOLD)[:MAX_DETECTIONS]
+        return boxes[keep], scores[keep], classes[keep]
+
+    def submit(self, images, conf=0.25):
+        """Start inference on up to max_batch BGR images without waiting for it, returns a handle for collect()"""
+        slot = self.slots[self.next_slot]
+        self.next_slot = (self.next_slot + 1) % len(self.slots)
+
+        # The slot's previous batch must be done before its buffers are overwritten
+        slot.stream.synchronize()
+
+        n = len(images)
+        shapes = [img.shape[:2] for img in images]
+        nbytes = slot.stage(images)
+        with torch.cuda.stream(slot.stream):
+            frames = slot.staging[:nbytes].to(self.device, non_blocking=True)
+            transforms = self.preprocess(frames, shapes, slot.input)
+            # Static-batch engines only accept their export batch, so run the unused rows as padding
+            batch = n if self.dynamic else self.max_batch
+            if not slot.context.set_input_shape(self.input_name, tuple(slot.input[:batch].shape)):
+                raise RuntimeError(f"Engine rejected a batch of {batch} images")
+            # A failed launch would leave the previous batch's detections in the output buffer
+            if not slot.context.execute_async_v3(slot.stream.cuda_stream):
+                raise RuntimeError("TensorRT inference failed to launch")
+        return slot, n, transforms, shapes, conf
+
+    def collect(self, handle):
+        """Wait for a batch started with submit(), returns (boxes, confidences, classes) per image"""
+        slot, n, transforms, shapes, conf = handle
+        with torch.cuda.stream(slot.stream):
+            results = self.postprocess(slot.output[:n], transforms, shapes, conf)
+        slot.stream.synchronize()
+        return results
+
+    def __call__(self, images, conf=0.25):
+        """Detect objects in a list of BGR images, returns (boxes, confidences, classes) per image"""
+        results, pending = [], []
+        for start in range(0, len(images), self.max_batch):
+            # Collect the oldest batch before its slot is reused
+            if len(pending) == len(self.slots):
+                results += self.collect(pending.pop(0))
+            pending.append(self.submit(images[start:start + self.max_batch], conf))
+        for handle in pending:
+            results += self.collect(handle)
+        return results
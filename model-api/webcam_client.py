@@ -6,9 +6,13 @@ Captures frames from webcam and sends them to the Model API at configurable FPS.
 """
 
 import cv2
-import requests
+import httpx
+import asyncio
 import time
+import sys
+import threading
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 # =============================================================================
 # CONFIGURATION
@@ -18,119 +22,300 @@ import argparse
 DEFAULT_FPS = 10                                    # Frames per second to send to API
 DEFAULT_ENDPOINT = "http://localhost:8000"          # Model API endpoint
 DEFAULT_INPUT_SOURCE = 0                            # Webcam index (0 = default camera)
+DEFAULT_CLIENT = "default"                          # Client id the API uses when /result/ is called without one
 
 # Network configuration
 REQUEST_TIMEOUT = 5.0                               # Timeout for API requests (seconds)
+ENCODE_QUEUE_SIZE = 2                               # Captured frames waiting for encoding before the oldest is dropped
+UPLOAD_QUEUE_SIZE = 2                               # Encoded frames waiting for upload before the oldest is dropped
+
+# Logging configuration
+STATS_INTERVAL = 1.0                                # Seconds between progress reports
 
 # Video configuration
 JPEG_QUALITY = 80                                   # JPEG compression quality (1-100)
+DEFAULT_IMGSZ = 640                                 # Model input size, frames are downscaled to fit before upload
 
 # =============================================================================
 # API COMMUNICATION
 # =============================================================================
 
-def send_frame_to_api(frame, endpoint: str) -> bool:
+def encode_frame(frame, imgsz: int, jpeg_quality: int) -> bytes:
     """
-    Send a frame to the Model API for prediction.
+    Downscale a frame to fit the model input size and encode it as JPEG (OpenCV uses libjpeg-turbo).
+    
+    The aspect ratio is kept, the server letterboxes the frame to a square input anyway.
     
     Args:
         frame: OpenCV frame (numpy array)
-        endpoint: API endpoint URL
+        imgsz: Model input size, the longer side of the frame is scaled down to it
+        jpeg_quality: JPEG compression quality (1-100)
         
     Returns:
-        bool: True if successful, False otherwise
+        bytes: JPEG encoded frame
     """
-    try:
-        # Encode frame as JPEG
-        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    height, width = frame.shape[:2]
+    scale = imgsz / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    return buffer.tobytes()
+
+async def send_frame_to_api(client: httpx.AsyncClient, jpeg: bytes, endpoint: str, client_id: str) -> bool:
+    """
+    Send an encoded frame to the Model API for prediction.
+    
+    Args:
+        client: Shared HTTP client (keeps the connection alive across frames)
+        jpeg: JPEG encoded frame
+        endpoint: API endpoint URL
+        client_id: Stream id the API keeps this client's results under
         
-        # Prepare the file for upload
-        files = {'image': ('frame.jpg', buffer.tobytes(), 'image/jpeg')}
+    Returns:
+        bool: True if the API accepted the frame, False otherwise
         
-        # Send POST request to /predict/
-        response = requests.post(
-            f"{endpoint}/predict/",
-            files=files,
-            timeout=REQUEST_TIMEOUT
-        )
+    Raises:
+        httpx.HTTPError: If the request could not be sent
+    """
+    # Prepare the file for upload
+    files = {'image': ('frame.jpg', jpeg, 'image/jpeg')}
+    
+    # Send POST request to /predict/
+    response = await client.post(f"{endpoint}/predict/", files=files, params={'client': client_id})
+    
+    return response.status_code == 200
+
+# =============================================================================
+# VIDEO CAPTURE
+# =============================================================================
+
+def drain_until(cap, deadline: float) -> bool:
+    """
+    Grab (without decoding) and discard camera frames until the deadline.
+    
+    Keeps the driver buffer empty so the next retrieved frame is the freshest one.
+    Each grab blocks until the camera delivers a frame, so this does not busy-wait.
+    
+    Args:
+        cap: OpenCV video capture
+        deadline: time.time() value to stop at
         
-        return response.status_code == 200
-            
-    except Exception as e:
-        print(f"Error sending frame: {e}")
-        return False
+    Returns:
+        bool: False if the camera stopped delivering frames
+    """
+    while time.time() < deadline:
+        if not cap.grab():
+            return False
+    return True
+
+def read_fresh_frame(cap):
+    """
+    Grab a new frame and decode only that one.
+    
+    Args:
+        cap: OpenCV video capture
+        
+    Returns:
+        tuple: (success, frame) like cap.read()
+    """
+    if not cap.grab():
+        return False, None
+    return cap.retrieve()
+
+# =============================================================================
+# PROGRESS REPORTING
+# =============================================================================
+
+def print_stats(stats: dict, start_time: float, stop: threading.Event):
+    """
+    Print send progress every STATS_INTERVAL seconds from a background thread.
+    
+    Keeps stdout writes (which can block under terminal back-pressure) out of
+    the capture and upload loop; the loop only bumps the counters in stats.
+    
+    Args:
+        stats: Counters shared with the encode and upload stages ('sent', 'failed', 'last_error')
+        start_time: time.time() when capturing started
+        stop: Event set when capturing ends
+    """
+    last_sent = 0
+    last_failed = 0
+    while not stop.wait(STATS_INTERVAL):
+        sent, failed = stats['sent'], stats['failed']
+        elapsed = time.time() - start_time
+        recent_fps = (sent - last_sent) / STATS_INTERVAL
+        print(f"Sent {sent} frames in {elapsed:.1f}s (avg {sent / elapsed:.1f} FPS, current {recent_fps:.1f} FPS)")
+        if failed > last_failed:
+            print(f"Failed to send {failed - last_failed} frames (last error: {stats['last_error']})")
+        last_sent, last_failed = sent, failed
 
 # =============================================================================
 # MAIN PROCESSING
 # =============================================================================
 
-def process_webcam(fps: int, input_source, endpoint: str):
+async def process_webcam(fps: int, input_source, endpoint: str, imgsz: int, jpeg_quality, client_id: str):
     """
     Main webcam processing function.
     
+    Capture, JPEG encode and upload run as separate stages connected by small
+    bounded queues, so frame N+1 is captured while frame N is encoded and frame
+    N-1 is uploaded. Capture and encode run in their own worker threads.
+    
     Args:
         fps: Target frames per second
         input_source: Video input source (camera index or file path)
         endpoint: Model API endpoint
+        imgsz: Model input size frames are downscaled to before upload
+        jpeg_quality: JPEG quality for re-encoding, None uploads MJPG camera frames as-is
+        client_id: Stream id sent with every frame, results are read back with /result/?client=<id>
+                   ("default" is what /result/ returns without a client)
     """
-    # Initialize video capture
-    cap = cv2.VideoCapture(input_source)
+    # Initialize video capture, asking Linux webcams for MJPG instead of YUYV so
+    # OpenCV does not have to convert every frame to BGR in software
+    if isinstance(input_source, int) and sys.platform.startswith("linux"):
+        cap = cv2.VideoCapture(input_source, cv2.CAP_V4L2)
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    else:
+        cap = cv2.VideoCapture(input_source)
     
     if not cap.isOpened():
         print(f"Error: Could not open video source {input_source}")
         return
     
+    # Ask the camera driver for frames close to the model input size, so most UVC
+    # webcams already deliver small frames and the resize in encode_frame is skipped
+    is_camera = isinstance(input_source, int)
+    if is_camera:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, imgsz)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, imgsz)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Hold at most one stale frame in the driver
+    
+    # If the camera really delivers MJPG, read the raw JPEG bytes and upload them without
+    # decoding or re-encoding, unless a specific JPEG quality was requested. Drivers may
+    # ignore the requested size, so only do it when the frames already fit imgsz
+    passthrough = False
+    delivered = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    if (jpeg_quality is None and int(cap.get(cv2.CAP_PROP_FOURCC)) == cv2.VideoWriter_fourcc(*'MJPG')
+            and 0 < max(delivered) <= imgsz):
+        passthrough = cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    if passthrough:
+        print(f"Camera delivers {delivered[0]}x{delivered[1]} MJPG, uploading frames without re-encoding")
+    
     print(f"Capturing from source {input_source} at {fps} FPS")
     print(f"Sending frames to {endpoint}/predict/")
     print("Press Ctrl+C to stop")
     
     # Calculate frame interval
     frame_interval = 1.0 / fps
-    last_send_time = 0
+    next_send_time = time.time()
     frame_count = 0
-    successful_sends = 0
+    stats = {'sent': 0, 'failed': 0, 'last_error': None}
     start_time = time.time()
     
-    try:
+    loop = asyncio.get_running_loop()
+    capture_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
+    encode_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+    encode_queue = asyncio.Queue(maxsize=ENCODE_QUEUE_SIZE)
+    upload_queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_SIZE)
+    
+    def put_latest(queue: asyncio.Queue, item):
+        """Queue an item, dropping the oldest pending one when the next stage falls behind."""
+        if queue.full():
+            queue.get_nowait()
+            queue.task_done()
+        queue.put_nowait(item)
+    
+    async def encode_frames():
+        """Encode captured frames in order as they come off the queue."""
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Error: Could not read frame from camera")
-                break
-            
-            current_time = time.time()
-            frame_count += 1
-            
-            # Send frame to API at specified FPS
-            if current_time - last_send_time >= frame_interval:
-                success = send_frame_to_api(frame, endpoint)
-                if success:
-                    successful_sends += 1
-                    last_send_time = current_time
+            frame = await encode_queue.get()
+            try:
+                if passthrough:
+                    jpeg = frame.tobytes()
+                else:
+                    jpeg = await loop.run_in_executor(
+                        encode_pool, encode_frame, frame, imgsz, jpeg_quality or JPEG_QUALITY
+                    )
+                put_latest(upload_queue, jpeg)
+            except Exception as e:
+                stats['failed'] += 1
+                stats['last_error'] = e
+            finally:
+                encode_queue.task_done()
+    
+    async def upload_frames(client: httpx.AsyncClient):
+        """Upload encoded frames in order as they come off the queue."""
+        while True:
+            jpeg = await upload_queue.get()
+            try:
+                if await send_frame_to_api(client, jpeg, endpoint, client_id):
+                    stats['sent'] += 1
+                else:
+                    stats['failed'] += 1
+                    stats['last_error'] = "unexpected status code"
+            except Exception as e:
+                stats['failed'] += 1
+                stats['last_error'] = e
+            finally:
+                upload_queue.task_done()
+    
+    # Report progress from a separate thread so printing never stalls the loop
+    stop_stats = threading.Event()
+    threading.Thread(target=print_stats, args=(stats, start_time, stop_stats), daemon=True).start()
+    
+    try:
+        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
+            encoder = asyncio.create_task(encode_frames())
+            uploader = asyncio.create_task(upload_frames(client))
+            try:
+                while True:
+                    # Wait for the next send slot, this is both the FPS gate and the idle wait.
+                    # Cameras keep running meanwhile, so flush their frames to send the freshest one
+                    if is_camera:
+                        ret = await loop.run_in_executor(capture_pool, drain_until, cap, next_send_time)
+                    else:
+                        await asyncio.sleep(max(0, next_send_time - time.time()))
+                        ret = True
+                    next_send_time = max(next_send_time + frame_interval, time.time())
                     
-                    # Print progress every 50 successful sends
-                    if successful_sends % 50 == 0:
-                        elapsed = current_time - start_time
-                        actual_fps = successful_sends / elapsed
-                        print(f"Sent {successful_sends} frames in {elapsed:.1f}s (avg {actual_fps:.1f} FPS)")
-            
-            # Small delay to prevent excessive CPU usage
-            time.sleep(0.01)
+                    if ret:
+                        ret, frame = await loop.run_in_executor(capture_pool, read_fresh_frame, cap)
+                    if not ret:
+                        print("Error: Could not read frame from camera")
+                        break
+                    frame_count += 1
+                    put_latest(encode_queue, frame)
+                
+                # Send the frames still in the pipeline, e.g. the last frames of a video file
+                await encode_queue.join()
+                await upload_queue.join()
+            finally:
+                encoder.cancel()
+                uploader.cancel()
+                for result in await asyncio.gather(encoder, uploader, return_exceptions=True):
+                    if not isinstance(result, asyncio.CancelledError):
+                        print(f"Error: pipeline stage failed: {result!r}")
     
-    except KeyboardInterrupt:
+    except asyncio.CancelledError:
         print("\nStopped by user")
     
     finally:
+        stop_stats.set()
+        capture_pool.shutdown()
+        encode_pool.shutdown()
         cap.release()
         
         # Print statistics
         elapsed_time = time.time() - start_time
-        actual_fps = successful_sends / elapsed_time if elapsed_time > 0 else 0
-        success_rate = (successful_sends / frame_count * 100) if frame_count > 0 else 0
+        actual_fps = stats['sent'] / elapsed_time if elapsed_time > 0 else 0
+        success_rate = (stats['sent'] / frame_count * 100) if frame_count > 0 else 0
         
         print("\nStatistics:")
         print(f"  Frames captured: {frame_count}")
-        print(f"  Frames sent successfully: {successful_sends}")
+        print(f"  Frames sent successfully: {stats['sent']}")
+        if stats['failed']:
+            print(f"  Frames failed: {stats['failed']} (last error: {stats['last_error']})")
         print(f"  Success rate: {success_rate:.1f}%")
         print(f"  Average send rate: {actual_fps:.1f} FPS")
         print(f"  Duration: {elapsed_time:.1f} seconds")
@@ -149,6 +334,12 @@ def main():
                        help=f'Model API endpoint URL (default: {DEFAULT_ENDPOINT})')
     parser.add_argument('--input', type=str, default=str(DEFAULT_INPUT_SOURCE),
                        help=f'Input source: camera index or video file path (default: {DEFAULT_INPUT_SOURCE})')
+    parser.add_argument('--imgsz', type=int, default=DEFAULT_IMGSZ,
+                       help=f'Model input size, frames are downscaled to fit before upload (default: {DEFAULT_IMGSZ})')
+    parser.add_argument('--jpeg-quality', type=int, default=None,
+                       help=f'JPEG quality for re-encoding frames (default: {JPEG_QUALITY}, MJPG camera frames that fit --imgsz are sent as-is unless set)')
+    parser.add_argument('--client', type=str, default=DEFAULT_CLIENT,
+                       help=f'Client id for the API, results are read back with /result/?client=<id> (default: {DEFAULT_CLIENT})')
     
     args = parser.parse_args()
     
@@ -164,11 +355,13 @@ def main():
     print(f"FPS: {args.fps}")
     print(f"Endpoint: {args.endpoint}")
     print(f"Input Source: {input_source}")
+    print(f"Image Size: {args.imgsz}")
+    print(f"Client ID: {args.client}")
     print("=" * 50)
     
     # Test API connectivity
     try:
-        response = requests.get(f"{args.endpoint}/", timeout=5)
+        response = httpx.get(f"{args.endpoint}/", timeout=5)
         if response.status_code == 200:
             print("✓ API connection successful")
         else:
@@ -180,11 +373,16 @@ def main():
     
     # Start main processing
     try:
-        process_webcam(
+        asyncio.run(process_webcam(
             fps=args.fps,
             input_source=input_source,
-            endpoint=args.endpoint
-        )
+            endpoint=args.endpoint,
+            imgsz=args.imgsz,
+            jpeg_quality=args.jpeg_quality,
+            client_id=args.client
+        ))
+    except KeyboardInterrupt:
+        pass  # Already reported by process_webcam
     except Exception as e:
         print(f"Error: {e}")
 
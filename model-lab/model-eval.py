@@ -6,6 +6,8 @@ import numpy as np
 from ultralytics import YOLO
 import os
 
+MIN_CONFIDENCE = 0.1  # Lowest threshold on the slider, inference keeps everything above it
+
 class YOLODetectionGUI:
     def __init__(self, root):
         self.root = root
@@ -17,6 +19,17 @@ class YOLODetectionGUI:
         self.current_image = None
         self.current_image_path = None
         
+        # Cached per selected image, so redraws never reopen the file or rerun the model
+        self._orig_size = None
+        self._thumb = None
+        self._last_results = None
+        
+        # Load the label font once, it is used on every redraw
+        try:
+            self._font = ImageFont.truetype("arial.ttf", 12)
+        except Exception:
+            self._font = ImageFont.load_default()
+        
         self.setup_ui()
         self.load_model()
     
@@ -74,7 +87,7 @@ class YOLODetectionGUI:
         
         ttk.Label(threshold_frame, text="Confidence Threshold:").pack(side=tk.LEFT)
         self.confidence_var = tk.DoubleVar(value=0.5)
-        self.confidence_scale = ttk.Scale(threshold_frame, from_=0.1, to=1.0, 
+        self.confidence_scale = ttk.Scale(threshold_frame, from_=MIN_CONFIDENCE, to=1.0, 
                                         variable=self.confidence_var, orient=tk.HORIZONTAL)
         self.confidence_scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 5))
         
@@ -83,6 +96,9 @@ class YOLODetectionGUI:
         
         # Update confidence label
         self.confidence_var.trace('w', self.update_confidence_label)
+        
+        # Redraw cached detections when the threshold moves
+        self.confidence_var.trace('w', self._on_threshold_change)
     
     def load_model(self):
         """Load the YOLO model by letting user select the file"""
@@ -129,24 +145,31 @@ class YOLODetectionGUI:
         )
         
         if file_path:
+            try:
+                # Open the image and build the display thumbnail once
+                self.current_image = Image.open(file_path)
+                self._orig_size = self.current_image.size
+                
+                # Calculate display size (max 400x400)
+                display_size = (400, 400)
+                self._thumb = self.current_image.copy()
+                self._thumb.thumbnail(display_size, Image.Resampling.LANCZOS)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to open image: {str(e)}")
+                return
+            
             self.current_image_path = file_path
-            self.display_image(file_path)
             self.clear_results()
     
-    def display_image(self, image_path, results=None):
+    def display_image(self, results=None):
         """Display the selected image in the GUI"""
         try:
-            # Open and resize image for display
-            image = Image.open(image_path)
-            self.current_image = image.copy()
-            
-            # Calculate display size (max 400x400)
-            display_size = (400, 400)
-            image.thumbnail(display_size, Image.Resampling.LANCZOS)
+            # Start from a fresh copy of the cached thumbnail
+            image = self._thumb.copy()
             
             # If results are provided, draw bounding boxes
             if results:
-                image = self.draw_detections(image, results, image_path)
+                image = self.draw_detections(image, results)
             
             # Convert to PhotoImage
             photo = ImageTk.PhotoImage(image)
@@ -158,12 +181,11 @@ class YOLODetectionGUI:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to display image: {str(e)}")
     
-    def draw_detections(self, display_image, results, original_image_path):
+    def draw_detections(self, display_image, results):
         """Draw bounding boxes and labels on the image"""
         try:
             # Get original image dimensions
-            original_image = Image.open(original_image_path)
-            orig_width, orig_height = original_image.size
+            orig_width, orig_height = self._orig_size
             disp_width, disp_height = display_image.size
             
             # Calculate scaling factors
@@ -172,25 +194,21 @@ class YOLODetectionGUI:
             
             draw = ImageDraw.Draw(display_image)
             
-            # Try to load a font
-            try:
-                font = ImageFont.truetype("arial.ttf", 12)
-            except Exception:
-                font = ImageFont.load_default()
-            
             # Draw bounding boxes
             for result in results:
                 boxes = result.boxes
                 if boxes is not None:
-                    for box in boxes:
-                        # Get box coordinates and scale them
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+                    # Move all boxes to the CPU at once instead of syncing per box
+                    xyxy = boxes.xyxy.cpu().numpy()
+                    confs = boxes.conf.cpu().numpy()
+                    clss = boxes.cls.int().cpu().numpy()
+                    
+                    for (x1, y1, x2, y2), confidence, class_id in zip(xyxy, confs, clss):
+                        # Scale box coordinates
                         x1, y1, x2, y2 = int(x1 * scale_x), int(y1 * scale_y), int(x2 * scale_x), int(y2 * scale_y)
                         
-                        # Get confidence and class
-                        confidence = box.conf[0].cpu().numpy()
-                        class_id = int(box.cls[0].cpu().numpy())
-                        class_name = self.model.names[class_id]
+                        # Get class
+                        class_name = self.model.names[int(class_id)]
                         
                         # Only draw if confidence is above threshold
                         if confidence >= self.confidence_var.get():
@@ -199,7 +217,7 @@ class YOLODetectionGUI:
                             
                             # Draw label
                             label = f"{class_name}: {confidence:.2f}"
-                            draw.text((x1, y1 - 15), label, fill="red", font=font)
+                            draw.text((x1, y1 - 15), label, fill="red", font=self._font)
             
             return display_image
             
@@ -218,14 +236,15 @@ class YOLODetectionGUI:
             return
         
         try:
-            # Run inference
-            results = self.model(self.current_image_path, conf=self.confidence_var.get())
+            # Run inference down to the slider minimum, the threshold is applied when drawing
+            results = self.model(self.current_image, conf=MIN_CONFIDENCE)
+            self._last_results = results
             
             # Display results
             self.display_results(results)
             
             # Update image with bounding boxes
-            self.display_image(self.current_image_path, results)
+            self.display_image(results)
             
         except Exception as e:
             messagebox.showerror("Error", f"Detection failed: {str(e)}")
@@ -239,14 +258,15 @@ class YOLODetectionGUI:
         for result in results:
             boxes = result.boxes
             if boxes is not None:
-                for box in boxes:
-                    confidence = box.conf[0].cpu().numpy()
-                    class_id = int(box.cls[0].cpu().numpy())
-                    class_name = self.model.names[class_id]
+                # Move all boxes to the CPU at once instead of syncing per box
+                xyxy = boxes.xyxy.cpu().numpy()
+                confs = boxes.conf.cpu().numpy()
+                clss = boxes.cls.int().cpu().numpy()
+                
+                for (x1, y1, x2, y2), confidence, class_id in zip(xyxy, confs, clss):
+                    class_name = self.model.names[int(class_id)]
                     
                     if confidence >= self.confidence_var.get():
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        
                         result_text = f"{class_name:<15} {confidence:.3f} [{int(x1)},{int(y1)},{int(x2)},{int(y2)}]"
                         self.results_listbox.insert(tk.END, result_text)
                         total_detections += 1
@@ -259,12 +279,19 @@ class YOLODetectionGUI:
     def clear_results(self):
         """Clear the results listbox"""
         self.results_listbox.delete(0, tk.END)
+        self._last_results = None
         if self.current_image_path:
-            self.display_image(self.current_image_path)
+            self.display_image()
     
     def update_confidence_label(self, *args):
         """Update the confidence threshold label"""
         self.confidence_label.config(text=f"{self.confidence_var.get():.2f}")
+    
+    def _on_threshold_change(self, *args):
+        """Redraw the last detections for the new threshold without rerunning the model"""
+        if self._last_results is not None:
+            self.display_results(self._last_results)
+            self.display_image(self._last_results)
 
 def main():
     root = tk.Tk()
@@ -1,3 +1,4 @@
+import os
 from ultralytics import YOLO
 
 model = YOLO("model-lab/yolo11/yolo11s.pt")
@@ -13,5 +14,12 @@ train_results = model.train(
 # Evaluate model performance on the validation set
 metrics = model.val()
 
-# Export the model to ONNX format
-path = model.export(format="engine", half=True, dynamic=True, device=0)  # return path to exported model
+# Export an INT8 TensorRT engine, calibrated on the training dataset, and keep it as best_int8.engine
+# since the FP16 export below writes to the same path
+exported_path = model.export(format="engine", int8=True, data="model-lab/dataset/data.yaml", dynamic=True, simplify=True, workspace=8, batch=4, nms=True, device=0)
+int8_path = exported_path.replace(".engine", "_int8.engine")
+os.replace(exported_path, int8_path)
+
+# Export the model to a TensorRT engine, the Model API requires an FP16 (half=True) build
+# nms=True fuses NMS into the engine so the API skips its own post-processing pass
+path = model.export(format="engine", half=True, dynamic=True, simplify=True, workspace=8, batch=4, nms=True, device=0)  # return path to exported model